@@ -1,12 +1,15 @@
 from __future__ import annotations
-import io, os
-from datetime import datetime, timedelta, date
+import io, os, hashlib
+from datetime import datetime, date
 from typing import Dict, List
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 import configparser
+import openpyxl
 import pydeck as pdk
+import xlsxwriter
 
 import streamlit.components.v1 as components
 
@@ -18,19 +21,30 @@ def _safe_get(cfg, sect, opt, default=""):
         return default
 
 
+@st.cache_data(show_spinner=False)
+def _template_columns_cached(path: str, mtime: float) -> List[str]:
+    try:
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            header = next(wb.active.iter_rows(min_row=1, max_row=1, values_only=True), ())
+            return [c for c in header if c is not None]
+        finally:
+            wb.close()
+    except Exception:
+        return []
+
+
 def load_excel_template_columns(path: str) -> List[str]:
     if os.path.exists(path):
-        try:
-            return pd.read_excel(path, engine="openpyxl").columns.tolist()
-        except Exception:
-            pass
+        return _template_columns_cached(path, os.path.getmtime(path))
     return []
 
 
-def load_config(
-    path: str = "config.ini",
+@st.cache_data(show_spinner=False)
+def _load_config_cached(
+    path: str, mtime: float
 ) -> tuple[
-    List[str], Dict[str, List[str]], List[str], str, Dict[str, List[str]], str, str
+    frozenset[str], Dict[str, List[str]], frozenset[str], str, Dict[str, List[str]], str, str, int
 ]:
     cfg = configparser.ConfigParser()
     cfg.optionxform = str
@@ -49,15 +63,91 @@ def load_config(
             pc_map[p] = [x.strip() for x in cfg.get("PARENT_CHILD_RELATIONS", p).split(",")]
 
     return (
-        prot,
+        frozenset(prot),
         dd_vals,
-        [c.strip() for c in _safe_get(cfg, "REQUIRED_COLUMNS", "columns").split(",") if c],
+        frozenset(c.strip() for c in _safe_get(cfg, "REQUIRED_COLUMNS", "columns").split(",") if c),
         _safe_get(cfg, "GENERAL", "base_save_path", "output"),
         pc_map,
         _safe_get(cfg, "GENERAL", "excel_autoload_path", ""),
         _safe_get(cfg, "GENERAL", "excel_template_path", "test.xlsx"),
+        int(_safe_get(cfg, "GENERAL", "display_bin_meters", "10") or 10),
     )
 
+
+def load_config(
+    path: str = "config.ini",
+) -> tuple[
+    frozenset[str], Dict[str, List[str]], frozenset[str], str, Dict[str, List[str]], str, str, int
+]:
+    mtime = os.path.getmtime(path) if os.path.exists(path) else 0.0
+    return _load_config_cached(path, mtime)
+
+
+# El RSSI solo pinta colores en el mapa: float32 da sobra de precision y
+# reduce memoria a la mitad. Las coordenadas se quedan en float64 en ambos
+# CSVs: las claves de bin de 1 cm exigen igualdad exacta entre frames y el
+# error de redondeo de float32 (~19 cm en estas latitudes) rompe el join.
+_COV_CSV_DTYPES = {
+    "RSSI / RSCP (dBm)": "float32",
+}
+
+
+@st.cache_data(show_spinner=False)
+def _editable_columns(cols: tuple[str, ...], protected: frozenset[str]) -> List[str]:
+    return [c for c in cols if c not in protected]
+
+
+@st.cache_data(show_spinner=False)
+def _parse_csv(raw: bytes, dtypes: Dict[str, str] | None = None) -> pd.DataFrame:
+    try:
+        # Lector multihilo de Arrow; evita la inferencia de tipos en Python
+        return pd.read_csv(io.BytesIO(raw), engine="pyarrow", dtype=dtypes)
+    except (ImportError, ValueError):
+        return pd.read_csv(io.BytesIO(raw), dtype=dtypes)
+
+
+def _display_aggregate(cov: pd.DataFrame, bin_meters: int) -> pd.DataFrame:
+    # Un punto medio por celda de ~bin_meters metros para la capa de cobertura;
+    # 1e-5 grados ≈ 1.11 m, asi que el divisor fija el lado de la celda en metros
+    lat = cov["Latitud"].to_numpy(dtype="float64")
+    lon = cov["Longitud"].to_numpy(dtype="float64")
+    rssi = cov["RSSI / RSCP (dBm)"].to_numpy(dtype="float64")
+    mask = ~(np.isnan(lat) | np.isnan(lon))
+    lat, lon, rssi = lat[mask], lon[mask], rssi[mask]
+    bins = np.stack(
+        [
+            np.floor(lat * 1e5 / bin_meters).astype(np.int32),
+            np.floor(lon * 1e5 / bin_meters).astype(np.int32),
+        ],
+        axis=1,
+    )
+    keys, idx = np.unique(bins, axis=0, return_inverse=True)
+    counts = np.bincount(idx, minlength=len(keys))
+    return pd.DataFrame(
+        {
+            "lat": np.bincount(idx, weights=lat, minlength=len(keys)) / counts,
+            "lon": np.bincount(idx, weights=lon, minlength=len(keys)) / counts,
+            "coverage": np.bincount(idx, weights=rssi, minlength=len(keys)) / counts,
+        }
+    )
+
+
+_NAN_BIN = np.iinfo(np.int32).min
+
+
+def _coord_bins(coords: np.ndarray) -> np.ndarray:
+    # Bin entero a ~1 cm. La igualdad exacta entre frames solo se sostiene si
+    # ambos lados del merge parten de coordenadas parseadas en float64: un paso
+    # por float32 desplaza la clave ~17 unidades de bin y deshace el join.
+    # Las coordenadas sin valor reciben un sentinel fuera de rango
+    # (|coord| * 1e7 < 2**31) en vez de dejar que el cast de NaN emita
+    # RuntimeWarning y fabrique claves que casan entre ambos frames.
+    out = np.full(coords.shape, _NAN_BIN, dtype=np.int32)
+    ok = ~np.isnan(coords)
+    out[ok] = np.rint(coords[ok] * 1e7).astype(np.int32)
+    return out
+
+
 # ────────────────────────── Init & session ──────────────────────────────
 if "df" not in st.session_state:
     st.session_state.df = pd.DataFrame()
@@ -69,6 +159,7 @@ if "df" not in st.session_state:
     PARENT_CHILD_MAP,
     EXCEL_AUTOLOAD,
     EXCEL_TEMPLATE_PATH,
+    DISPLAY_BIN_METERS,
 ) = load_config()
 
 st.set_page_config(page_title="Potential Work Orders Management", layout="wide")
@@ -87,12 +178,12 @@ if "processed" not in st.session_state:
     # Comprobación tras carga
     if geo_file and cov_file:
         # Procesamiento como ya tienes abajo
-        geo_raw = pd.read_csv(geo_file)
+        geo_raw = _parse_csv(geo_file.getvalue())
         if not {"Latitud", "Longitud"}.issubset(geo_raw.columns):
             st.error("Georadar debe tener columnas Latitud y Longitud")
             st.stop()
 
-        st.session_state.geo_df = geo_raw.copy()
+        st.session_state.geo_df = geo_raw
         gdf = geo_raw.rename(columns={
             "Latitud": "Latitude - Functional Location",
             "Longitud": "Longitude - Functional Location",
@@ -100,33 +191,39 @@ if "processed" not in st.session_state:
         gdf["Service Account - Work Order"] = "ANER_Senegal"
         gdf["Billing Account - Work Order"] = "ANER_Senegal"
         gdf["Work Order Type - Work Order"] = "Installation"
-        st.session_state.df = gdf
 
-        cov_raw = pd.read_csv(cov_file)
+        cov_raw = _parse_csv(cov_file.getvalue(), _COV_CSV_DTYPES)
         if not {"Latitud", "Longitud", "RSSI / RSCP (dBm)"}.issubset(cov_raw.columns):
             st.error("Coverage debe tener Latitud, Longitud, RSSI / RSCP (dBm)")
             st.stop()
 
-        st.session_state.cov_df = cov_raw.copy()
-
-        gdf["LatBin"] = gdf["Latitude - Functional Location"].round(10)
-        gdf["LonBin"] = gdf["Longitude - Functional Location"].round(10)
-        cov_raw["LatBin"] = cov_raw["Latitud"].round(10)
-        cov_raw["LonBin"] = cov_raw["Longitud"].round(10)
-        cov_map = cov_raw.set_index(["LatBin", "LonBin"])["RSSI / RSCP (dBm)"].to_dict()
-        gdf["dBm"] = gdf.apply(lambda r: cov_map.get((r.LatBin, r.LonBin)), axis=1)
-
-        def classify(v):
-            if pd.isna(v):
-                return None
-            if -70 <= v <= -10:
-                return "YES"
-            if -200 <= v < -70:
-                return "NO"
-            return None
-
-        gdf["Gateway"] = gdf["dBm"].apply(classify)
+        # Solo se conserva el agregado por celda; el frame crudo no se vuelve a leer
+        st.session_state.cov_agg = _display_aggregate(cov_raw, DISPLAY_BIN_METERS)
+
+        # Bin entero a ~1 cm: igualdad exacta y hash int32 rapido en el merge
+        gdf["LatBin"] = _coord_bins(gdf["Latitude - Functional Location"].to_numpy(dtype=np.float64))
+        gdf["LonBin"] = _coord_bins(gdf["Longitude - Functional Location"].to_numpy(dtype=np.float64))
+        # Claves de cobertura en arrays locales; las filas sin coordenadas
+        # quedan fuera del join
+        cov_lat = cov_raw["Latitud"].to_numpy(dtype=np.float64)
+        cov_lon = cov_raw["Longitud"].to_numpy(dtype=np.float64)
+        cov_ok = ~(np.isnan(cov_lat) | np.isnan(cov_lon))
+        # Media por bin con clave factorizada + bincount: todo queda en NumPy
+        bins = np.stack([_coord_bins(cov_lat[cov_ok]), _coord_bins(cov_lon[cov_ok])], axis=1)
+        keys, idx = np.unique(bins, axis=0, return_inverse=True)
+        counts = np.bincount(idx, minlength=len(keys))
+        rssi_sum = np.bincount(idx, weights=cov_raw["RSSI / RSCP (dBm)"].to_numpy(dtype=np.float64)[cov_ok], minlength=len(keys))
+        cov_small = pd.DataFrame(
+            {"LatBin": keys[:, 0], "LonBin": keys[:, 1], "dBm": rssi_sum / counts}
+        )
+        gdf = gdf.merge(cov_small, on=["LatBin", "LonBin"], how="left")
+
+        v = gdf["dBm"].to_numpy()
+        mask_yes = (v >= -70) & (v <= -10)
+        mask_no = (v >= -200) & (v < -70)
+        gdf["Gateway"] = np.select([mask_yes, mask_no], ["YES", "NO"], default=None)
         gdf.drop(columns=["LatBin", "LonBin"], inplace=True)
+        st.session_state.df = gdf
 
         st.session_state.processed = True
         st.rerun()  # Forzar actualización para ocultar los uploaders
@@ -136,12 +233,12 @@ else:
 # ───────────────  Procesamiento una única vez ───────────────
 if geo_file and cov_file and "processed" not in st.session_state:
     # Georadar
-    geo_raw = pd.read_csv(geo_file)
+    geo_raw = _parse_csv(geo_file.getvalue())
     if not {"Latitud", "Longitud"}.issubset(geo_raw.columns):
         st.error("Georadar debe tener columnas Latitud y Longitud")
         st.stop()
 
-    st.session_state.geo_df = geo_raw.copy()
+    st.session_state.geo_df = geo_raw
     gdf = geo_raw.rename(
         columns={
             "Latitud": "Latitude - Functional Location",
@@ -151,35 +248,41 @@ if geo_file and cov_file and "processed" not in st.session_state:
     gdf["Service Account - Work Order"] = "ANER_Senegal"
     gdf["Billing Account - Work Order"] = "ANER_Senegal"
     gdf["Work Order Type - Work Order"] = "Installation"
-    st.session_state.df = gdf
 
     # Cobertura
-    cov_raw = pd.read_csv(cov_file)
+    cov_raw = _parse_csv(cov_file.getvalue(), _COV_CSV_DTYPES)
     if not {"Latitud", "Longitud", "RSSI / RSCP (dBm)"}.issubset(cov_raw.columns):
         st.error("Coverage debe tener Latitud, Longitud, RSSI / RSCP (dBm)")
         st.stop()
 
-    st.session_state.cov_df = cov_raw.copy()
+    # Solo se conserva el agregado por celda; el frame crudo no se vuelve a leer
+    st.session_state.cov_agg = _display_aggregate(cov_raw, DISPLAY_BIN_METERS)
 
     # Añadir dBm & Gateway
-    gdf["LatBin"] = gdf["Latitude - Functional Location"].round(10)
-    gdf["LonBin"] = gdf["Longitude - Functional Location"].round(10)
-    cov_raw["LatBin"] = cov_raw["Latitud"].round(10)
-    cov_raw["LonBin"] = cov_raw["Longitud"].round(10)
-    cov_map = cov_raw.set_index(["LatBin", "LonBin"])["RSSI / RSCP (dBm)"].to_dict()
-    gdf["dBm"] = gdf.apply(lambda r: cov_map.get((r.LatBin, r.LonBin)), axis=1)
-
-    def classify(v):
-        if pd.isna(v):
-            return None
-        if -70 <= v <= -10:
-            return "YES"
-        if -200 <= v < -70:
-            return "NO"
-        return None
-
-    gdf["Gateway"] = gdf["dBm"].apply(classify)
+    # Bin entero a ~1 cm: igualdad exacta y hash int32 rapido en el merge
+    gdf["LatBin"] = _coord_bins(gdf["Latitude - Functional Location"].to_numpy(dtype=np.float64))
+    gdf["LonBin"] = _coord_bins(gdf["Longitude - Functional Location"].to_numpy(dtype=np.float64))
+    # Claves de cobertura en arrays locales; las filas sin coordenadas
+    # quedan fuera del join
+    cov_lat = cov_raw["Latitud"].to_numpy(dtype=np.float64)
+    cov_lon = cov_raw["Longitud"].to_numpy(dtype=np.float64)
+    cov_ok = ~(np.isnan(cov_lat) | np.isnan(cov_lon))
+    # Media por bin con clave factorizada + bincount: todo queda en NumPy
+    bins = np.stack([_coord_bins(cov_lat[cov_ok]), _coord_bins(cov_lon[cov_ok])], axis=1)
+    keys, idx = np.unique(bins, axis=0, return_inverse=True)
+    counts = np.bincount(idx, minlength=len(keys))
+    rssi_sum = np.bincount(idx, weights=cov_raw["RSSI / RSCP (dBm)"].to_numpy(dtype=np.float64)[cov_ok], minlength=len(keys))
+    cov_small = pd.DataFrame(
+        {"LatBin": keys[:, 0], "LonBin": keys[:, 1], "dBm": rssi_sum / counts}
+    )
+    gdf = gdf.merge(cov_small, on=["LatBin", "LonBin"], how="left")
+
+    v = gdf["dBm"].to_numpy()
+    mask_yes = (v >= -70) & (v <= -10)
+    mask_no = (v >= -200) & (v < -70)
+    gdf["Gateway"] = np.select([mask_yes, mask_no], ["YES", "NO"], default=None)
     gdf.drop(columns=["LatBin", "LonBin"], inplace=True)
+    st.session_state.df = gdf
 
     st.session_state.processed = True
 
@@ -202,214 +305,225 @@ st.markdown("""
 
 # Cargar columnas desde plantilla
 _template_cols = load_excel_template_columns(EXCEL_TEMPLATE_PATH)
-disp = st.session_state.df.copy()
-for c in _template_cols:
-    if c not in disp.columns:
-        disp[c] = ""
-disp = disp[_template_cols]
+disp = st.session_state.df.reindex(columns=_template_cols, fill_value="")
 
 # Inicializar 'edited_df' si no existe
 if "edited_df" not in st.session_state:
-    st.session_state.edited_df = disp.copy()
-
-# --- Botones encima de la tabla ---
-col_left, col_spacer, col_right = st.columns([2, 6, 2])
-
-with col_left:
-    if st.button("🔁 Volver a cargar archivos", key="reload_button"):
-        for k in ["processed", "df", "geo_df", "cov_df", "edited_df", "latest_edited"]:
-            st.session_state.pop(k, None)
-        st.rerun()
-
-with col_right:
-    if st.button("💾 Guardar cambios", key="save_changes_top"):
-        st.session_state.edited_df = st.session_state.latest_edited.copy()
-        st.success("Cambios guardados.")
-
-# --- Tabla editable ---
-edited = st.data_editor(
-    st.session_state.edited_df,
-    num_rows="dynamic",
-    use_container_width=True,
-    key="editor"
-)
-
-# Guardar copia para posterior uso
-st.session_state.latest_edited = edited.copy()
-
-
-col1, col2, col3 = st.columns(3)
-
-# --- Añadir datos en bloque ---
-with col1:
-    st.markdown("### ➕ Añadir datos en bloque")
-    editable_cols = [c for c in edited.columns if c not in PROTECTED_COLUMNS]
-    col_sel = st.selectbox("Columna", editable_cols, key="col_sel")
-
-    if col_sel == "Name - Child Functional Location":
-        parents = edited["Name - Parent Functional Location"].dropna().unique()
-        par = parents[0] if len(parents) else None
-        if par and par in PARENT_CHILD_MAP:
-            val = st.selectbox("Valor hijo", PARENT_CHILD_MAP[par], key="child_val")
-        else:
-            st.warning("Define primero 'Parent Functional Location'.")
-            val = ""
-    elif col_sel in DROPDOWN_VALUES:
-        val = st.selectbox("Valor", DROPDOWN_VALUES[col_sel], key="dropdown_val")
-    else:
-        val = st.text_input("Valor", key="text_val")
+    st.session_state.edited_df = disp
+
+# --- Tabla editable + herramientas: fragmento propio, un click aqui
+# no reprocesa CSVs ni reconstruye el mapa ---
+@st.fragment
+def _tools_ui():
+    # --- Botones encima de la tabla ---
+    col_left, col_spacer, col_right = st.columns([2, 6, 2])
+
+    with col_left:
+        if st.button("🔁 Volver a cargar archivos", key="reload_button"):
+            for k in ["processed", "df", "geo_df", "cov_agg", "edited_df", "latest_edited"]:
+                st.session_state.pop(k, None)
+            st.rerun(scope="app")
+
+    with col_right:
+        if st.button("💾 Guardar cambios", key="save_changes_top"):
+            st.session_state.edited_df = st.session_state.latest_edited.copy()
+            st.success("Cambios guardados.")
+            # El mapa vive en otro fragmento y lee edited_df: rerun completo
+            # (el Deck va cacheado por contenido, sin cambios sale gratis)
+            st.rerun(scope="app")
+
+    # --- Tabla editable ---
+    edited = st.data_editor(
+        st.session_state.edited_df,
+        num_rows="dynamic",
+        use_container_width=True,
+        key="editor"
+    )
 
-    if st.button("📌 Aplicar", key="apply_val"):
-        if col_sel and val:
-            st.session_state.edited_df[col_sel] = val
-            st.success("Valor aplicado.")
+    # Guardar copia para posterior uso
+    st.session_state.latest_edited = edited.copy()
+
+
+    col1, col2, col3 = st.columns(3)
+
+    # --- Añadir datos en bloque ---
+    with col1:
+        st.markdown("### ➕ Añadir datos en bloque")
+        editable_cols = _editable_columns(tuple(edited.columns), PROTECTED_COLUMNS)
+        col_sel = st.selectbox("Columna", editable_cols, key="col_sel")
+
+        if col_sel == "Name - Child Functional Location":
+            parents = edited["Name - Parent Functional Location"].dropna().unique()
+            par = parents[0] if len(parents) else None
+            if par and par in PARENT_CHILD_MAP:
+                val = st.selectbox("Valor hijo", PARENT_CHILD_MAP[par], key="child_val")
+            else:
+                st.warning("Define primero 'Parent Functional Location'.")
+                val = ""
+        elif col_sel in DROPDOWN_VALUES:
+            val = st.selectbox("Valor", DROPDOWN_VALUES[col_sel], key="dropdown_val")
+        else:
+            val = st.text_input("Valor", key="text_val")
+
+        if st.button("📌 Aplicar", key="apply_val"):
+            if col_sel and val:
+                st.session_state.edited_df[col_sel] = val
+                st.success("Valor aplicado.")
+                st.rerun()
+
+    # --- Autocompletar fechas/horas ---
+    with col2:
+        st.markdown("### ⏱️ Autocompletar fechas/horas")
+        d0 = st.date_input("Fecha inicial", value=date.today(), key="fecha_ini")
+        t0 = st.time_input("Hora inicial", value=datetime.now().time().replace(second=0, microsecond=0), key="hora_ini")
+        if st.button("🕒 Generar 27 min", key="gen_27min"):
+            start_dt = datetime.combine(d0, t0)
+            n = len(st.session_state.edited_df)
+            incs = np.datetime64(start_dt) + np.arange(n, dtype="i8") * np.timedelta64(27, "m")
+            incs_hhmmss = pd.to_datetime(incs).strftime("%H:%M:%S")
+
+            full = [
+                "Promised window From - Work Order",
+                "Promised window To - Work Order",
+                "StartTime - Bookable Resource Booking",
+                "EndTime - Bookable Resource Booking",
+            ]
+            time_only = [
+                "Time window From - Work Order",
+                "Time window To - Work Order",
+            ]
+            for c in full:
+                if c in st.session_state.edited_df.columns:
+                    st.session_state.edited_df[c] = incs
+            for c in time_only:
+                if c in st.session_state.edited_df.columns:
+                    st.session_state.edited_df[c] = incs_hhmmss
+            st.success("Columnas temporales rellenadas.")
             st.rerun()
 
-# --- Autocompletar fechas/horas ---
-with col2:
-    st.markdown("### ⏱️ Autocompletar fechas/horas")
-    d0 = st.date_input("Fecha inicial", value=date.today(), key="fecha_ini")
-    t0 = st.time_input("Hora inicial", value=datetime.now().time().replace(second=0, microsecond=0), key="hora_ini")
-    if st.button("🕒 Generar 27 min", key="gen_27min"):
-        start_dt = datetime.combine(d0, t0)
-        incs = [start_dt + timedelta(minutes=27 * i) for i in range(len(st.session_state.edited_df))]
-
-        full = [
-            "Promised window From - Work Order",
-            "Promised window To - Work Order",
-            "StartTime - Bookable Resource Booking",
-            "EndTime - Bookable Resource Booking",
-        ]
-        time_only = [
-            "Time window From - Work Order",
-            "Time window To - Work Order",
-        ]
-        for c in full:
-            if c in st.session_state.edited_df.columns:
-                st.session_state.edited_df[c] = incs
-        for c in time_only:
-            if c in st.session_state.edited_df.columns:
-                st.session_state.edited_df[c] = [d.time().strftime("%H:%M:%S") for d in incs]
-        st.success("Columnas temporales rellenadas.")
-        st.rerun()
-
-# --- Descargar Excel ---
-with col3:
-    st.markdown("### 💾 Descargar Excel")
-    if st.button("Generar y descargar Excel", key="gen_excel"):
-        df_out = st.session_state.edited_df.copy()
-        for c in _template_cols:
-            if c not in df_out.columns:
-                df_out[c] = ""
-        df_out = df_out[_template_cols]
-
-        buf = io.BytesIO()
-        with pd.ExcelWriter(buf, engine="openpyxl") as w:
-            df_out.to_excel(w, index=False)
-        buf.seek(0)
-
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        st.download_button(
-            "⬇️ Descargar Excel",
-            data=buf,
-            file_name=f"workorders_{ts}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
+    # --- Descargar Excel ---
+    with col3:
+        st.markdown("### 💾 Descargar Excel")
+        if st.button("Generar y descargar Excel", key="gen_excel"):
+            df_out = st.session_state.edited_df.reindex(columns=_template_cols, fill_value="")
+
+            buf = io.BytesIO()
+            # constant_memory exige escribir en orden estricto de filas y
+            # to_excel vuelca por columnas, asi que se escribe fila a fila
+            with xlsxwriter.Workbook(
+                buf,
+                {"constant_memory": True, "default_date_format": "yyyy-mm-dd hh:mm:ss"},
+            ) as wb:
+                ws = wb.add_worksheet()
+                ws.write_row(0, 0, list(df_out.columns))
+                for i, row in enumerate(df_out.itertuples(index=False), start=1):
+                    # NaN/NaT como celda vacia, igual que to_excel
+                    ws.write_row(i, 0, ["" if pd.isna(v) else v for v in row])
+            buf.seek(0)
+
+            ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+            st.download_button(
+                "⬇️ Descargar Excel",
+                data=buf,
+                file_name=f"workorders_{ts}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            )
+
+
+_tools_ui()
 
 
 # ───────────────  Mapa georadar y cobertura ───────────────
-# Preparar datos de georadar con dBm ya calculado en st.session_state.df
-geo_points = (
-    st.session_state.edited_df[[  # ← Aquí usamos el DF editado por el usuario
-        "Latitude - Functional Location",
-        "Longitude - Functional Location",
-        "dBm",
-    ]]
-    .dropna(subset=["Latitude - Functional Location", "Longitude - Functional Location"])
-    .copy()
-)
-geo_points.rename(
-    columns={
-        "Latitude - Functional Location": "lat",
-        "Longitude - Functional Location": "lon",
-        "dBm": "coverage",
-    },
-    inplace=True,
-)
-
-# Asignar color según cobertura
-def color_from_dbm(v: float | None):
-    if pd.isna(v):
-        return [255, 255, 255]  # gris si no hay valor
-    if v >= -70:
-        return [0, 153, 51]  # verde
-    if -80 <= v < -70:
-        return [255, 165, 0]  # naranja
-    return [255, 0, 0]  # rojo
-
-geo_points["color"] = geo_points["coverage"].apply(color_from_dbm)
-
-# Datos de cobertura originales
-cov_points = (
-    st.session_state.cov_df[["Latitud", "Longitud", "RSSI / RSCP (dBm)"]]
-    .dropna(subset=["Latitud", "Longitud"])
-    .copy()
-)
-cov_points.rename(
-    columns={
-        "Latitud": "lat",
-        "Longitud": "lon",
-        "RSSI / RSCP (dBm)": "coverage",
-    },
-    inplace=True,
-)
-cov_points["color"] = [[128, 128, 128]] * len(cov_points)  # gris fijo
-
-# Layers de PyDeck
-layers = [
-    # Capa de puntos de cobertura (gris, menor radio)
-    pdk.Layer(
-        "ScatterplotLayer",
-        data=cov_points,
-        get_position="[lon, lat]",
-        get_radius=3,
-        get_fill_color="color",
-        opacity=0.4,
-        pickable=True,
-        tooltip=True,
-    ),
-    # Capa de puntos georadar con color por dBm
-    pdk.Layer(
-        "ScatterplotLayer",
-        data=geo_points,
-        get_position="[lon, lat]",
-        get_radius=2,
-        get_fill_color="color",
-        pickable=True,
-    ),
-]
-
-# Vista inicial (centrada en la media de los puntos georadar)
-if not geo_points.empty:
-    init_view_state = pdk.ViewState(
-        latitude=geo_points["lat"].mean(),
-        longitude=geo_points["lon"].mean(),
-        zoom=17,
+# Clave compacta del contenido; los colores derivan de coverage, basta con esto
+def _points_key(data: Dict[str, np.ndarray]) -> bytes:
+    h = hashlib.blake2b(digest_size=8)
+    for c in ("lat", "lon", "coverage"):
+        h.update(np.ascontiguousarray(np.asarray(data[c], dtype=np.float64)).tobytes())
+    return h.digest()
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _build_deck(geo_key: bytes, cov_key: bytes, _geo_data, _cov_data) -> pdk.Deck:
+    # pydeck serializa tablas fila a fila; envolver los arrays no copia columnas
+    layers = [
+        # Capa de puntos de cobertura (gris, menor radio)
+        pdk.Layer(
+            "ScatterplotLayer",
+            data=pd.DataFrame(_cov_data),
+            get_position="[lon, lat]",
+            get_radius=3,
+            get_fill_color=[128, 128, 128],  # gris fijo
+            opacity=0.4,
+            pickable=True,
+            tooltip=True,
+        ),
+        # Capa de puntos georadar con color por dBm
+        pdk.Layer(
+            "ScatterplotLayer",
+            data=pd.DataFrame(_geo_data),
+            get_position="[lon, lat]",
+            get_radius=2,
+            get_fill_color="[r, g, b]",
+            pickable=True,
+        ),
+    ]
+
+    # Vista inicial: centro de los limites de ambas capas, en una pasada
+    lat_all = np.concatenate([_geo_data["lat"], _cov_data["lat"]])
+    lon_all = np.concatenate([_geo_data["lon"], _cov_data["lon"]])
+    if len(lat_all):
+        init_view_state = pdk.ViewState(
+            latitude=float((lat_all.min() + lat_all.max()) / 2),
+            longitude=float((lon_all.min() + lon_all.max()) / 2),
+            zoom=17,
+        )
+    else:
+        init_view_state = pdk.ViewState(latitude=0, longitude=0, zoom=2)
+
+    # Tooltip
+    tooltip = {
+        "html": "<b>dBm:</b> {coverage}",
+        "style": {"color": "white"},
+    }
+
+    return pdk.Deck(layers=layers, initial_view_state=init_view_state, tooltip=tooltip)
+
+
+# Fragmento del mapa: solo se reejecuta cuando algo suyo cambia
+@st.fragment
+def _map_ui():
+    # Preparar datos de georadar con dBm ya calculado en st.session_state.df
+    # ← Aquí usamos el DF editado por el usuario: mascara NumPy y una sola asignacion
+    _lat = st.session_state.edited_df["Latitude - Functional Location"].to_numpy(dtype="float64")
+    _lon = st.session_state.edited_df["Longitude - Functional Location"].to_numpy(dtype="float64")
+    _cov = st.session_state.edited_df["dBm"].to_numpy(dtype="float64")
+    _mask = ~(np.isnan(_lat) | np.isnan(_lon))
+    geo_points = pd.DataFrame({"lat": _lat[_mask], "lon": _lon[_mask], "coverage": _cov[_mask]})
+
+    # Asignar color según cobertura: canales r/g/b uint8 vectorizados
+    v = geo_points["coverage"].to_numpy(dtype="float64")
+    mask_blank = np.isnan(v)  # blanco si no hay valor
+    mask_green = ~mask_blank & (v >= -70)
+    mask_orange = ~mask_blank & (v >= -80) & (v < -70)
+    _color_masks = [mask_blank, mask_green, mask_orange]  # resto: rojo
+    geo_points["r"] = np.select(_color_masks, [255, 0, 255], default=255).astype(np.uint8)
+    geo_points["g"] = np.select(_color_masks, [255, 153, 165], default=0).astype(np.uint8)
+    geo_points["b"] = np.select(_color_masks, [255, 51, 0], default=0).astype(np.uint8)
+
+    # Datos de cobertura ya agregados por celda durante el procesamiento
+    cov_points = st.session_state.cov_agg
+
+    # Buffers contiguos minimos: claves de cache baratas y sin metadatos de pandas
+    geo_data = {k: geo_points[k].to_numpy() for k in ("lat", "lon", "coverage", "r", "g", "b")}
+    cov_data = {k: cov_points[k].to_numpy() for k in ("lat", "lon", "coverage")}
+
+    st.pydeck_chart(
+        _build_deck(_points_key(geo_data), _points_key(cov_data), geo_data, cov_data),
+        height=900  # puedes ajustar a 800, 900 si quieres más espacio
     )
-else:
-    init_view_state = pdk.ViewState(latitude=0, longitude=0, zoom=2)
 
-# Tooltip
-tooltip = {
-    "html": "<b>dBm:</b> {coverage}",
-    "style": {"color": "white"},
-}
 
-#st.pydeck_chart(pdk.Deck(layers=layers, initial_view_state=init_view_state, tooltip=tooltip))
-st.pydeck_chart(
-    pdk.Deck(layers=layers, initial_view_state=init_view_state, tooltip=tooltip),
-    height=900  # puedes ajustar a 800, 900 si quieres más espacio
-)
+_map_ui()
 
 
 st.caption("Desarrollado en Streamlit • Última actualización: 2025-06-30")